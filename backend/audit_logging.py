@@ -1,43 +1,103 @@
 """
 Audit logging for compliance and monitoring.
 """
-import json
+import atexit
 import logging
-from datetime import datetime
+import queue
+import time
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional, Dict, Any
 from pathlib import Path
 
-# Configure logging
+import orjson
+
 LOG_DIR = Path("logs")
-LOG_DIR.mkdir(exist_ok=True)
 
-# Set up audit logger
 audit_logger = logging.getLogger("audit")
-audit_logger.setLevel(logging.INFO)
+app_logger = logging.getLogger("app")
 
-# File handler for audit logs
-audit_handler = logging.FileHandler(LOG_DIR / "audit.log")
-audit_handler.setFormatter(
-    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-)
-audit_logger.addHandler(audit_handler)
+# Seconds-resolution part of the last formatted timestamp, reused while
+# the clock is still within the same second.
+_ts_last_sec = 0
+_ts_last_fmt = ""
 
-# Application logger
-app_logger = logging.getLogger("app")
-app_logger.setLevel(logging.INFO)
 
-app_handler = logging.FileHandler(LOG_DIR / "app.log")
-app_handler.setFormatter(
-    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-)
-app_logger.addHandler(app_handler)
+def _ts() -> str:
+    """
+    ISO-8601 UTC timestamp without allocating a datetime per log line.
+
+    strftime only runs when the wall clock crosses a second boundary;
+    within the same second just the microsecond suffix is formatted.
+    """
+    global _ts_last_sec, _ts_last_fmt
+    t = time.time()
+    sec = int(t)
+    if sec != _ts_last_sec:
+        _ts_last_fmt = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+        _ts_last_sec = sec
+    return f"{_ts_last_fmt}.{int((t % 1) * 1e6):06d}Z"
+
+
+@lru_cache(maxsize=1)
+def _init_loggers() -> None:
+    """
+    Attach file/console handlers on first log call.
+
+    Deferring this keeps importing the module free of filesystem side
+    effects (directory creation, opening log files), and the lru_cache
+    guard prevents duplicate handler registration when uvicorn's
+    autoreload re-imports the module.
+
+    The loggers only enqueue records; a QueueListener thread drains the
+    queue into the real file/console handlers, so request threads never
+    block on disk I/O.
+    """
+    LOG_DIR.mkdir(exist_ok=True)
+
+    file_format = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    # File handler for audit logs
+    audit_handler = logging.FileHandler(LOG_DIR / "audit.log")
+    audit_handler.setFormatter(file_format)
+
+    # Application handlers: file + console
+    app_handler = logging.FileHandler(LOG_DIR / "app.log")
+    app_handler.setFormatter(file_format)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(
+        logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    )
+
+    # Hot paths only pay for an enqueue; the listener threads do the
+    # formatting and file writes. One queue per logger keeps audit and
+    # app records routed to their own files.
+    audit_queue = queue.Queue(-1)
+    audit_logger.setLevel(logging.INFO)
+    # Keep records out of the root logger's console handler: audit
+    # entries carry user IDs and query text and belong in audit.log only
+    audit_logger.propagate = False
+    audit_logger.addHandler(QueueHandler(audit_queue))
+    audit_listener = QueueListener(
+        audit_queue, audit_handler, respect_handler_level=True
+    )
+    audit_listener.start()
+    atexit.register(audit_listener.stop)
 
-# Console handler
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(
-    logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-)
-app_logger.addHandler(console_handler)
+    app_queue = queue.Queue(-1)
+    app_logger.setLevel(logging.INFO)
+    # The listener's console handler already prints these; propagation
+    # to the root handler would duplicate every line
+    app_logger.propagate = False
+    app_logger.addHandler(QueueHandler(app_queue))
+    app_listener = QueueListener(
+        app_queue, app_handler, console_handler, respect_handler_level=True
+    )
+    app_listener.start()
+    atexit.register(app_listener.stop)
 
 
 def log_query(
@@ -56,7 +116,7 @@ def log_query(
         metadata: Additional metadata to log
     """
     log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": _ts(),
         "event_type": "query",
         "user_id": user_id,
         "query": query,
@@ -64,7 +124,8 @@ def log_query(
         "metadata": metadata or {}
     }
     
-    audit_logger.info(json.dumps(log_entry))
+    _init_loggers()
+    audit_logger.info(orjson.dumps(log_entry).decode())
 
 
 def log_access(
@@ -85,7 +146,7 @@ def log_access(
         reason: Reason for denial if not successful
     """
     log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": _ts(),
         "event_type": "access",
         "user_id": user_id,
         "resource_id": resource_id,
@@ -94,7 +155,8 @@ def log_access(
         "reason": reason
     }
     
-    audit_logger.info(json.dumps(log_entry))
+    _init_loggers()
+    audit_logger.info(orjson.dumps(log_entry).decode())
 
 
 def log_error(
@@ -111,14 +173,15 @@ def log_error(
         context: Additional context about the error
     """
     log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": _ts(),
         "event_type": "error",
         "error_type": error_type,
         "error_message": error_message,
         "context": context or {}
     }
     
-    app_logger.error(json.dumps(log_entry))
+    _init_loggers()
+    app_logger.error(orjson.dumps(log_entry).decode())
 
 
 def log_system_event(
@@ -135,10 +198,11 @@ def log_system_event(
         metadata: Additional metadata
     """
     log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": _ts(),
         "event_type": event_type,
         "description": description,
         "metadata": metadata or {}
     }
     
-    app_logger.info(json.dumps(log_entry))
+    _init_loggers()
+    app_logger.info(orjson.dumps(log_entry).decode())
@@ -7,6 +7,8 @@ import jwt
 from datetime import datetime, timedelta
 import os
 
+from auth_cache import get_cached_payload, cache_payload
+
 # Load from environment variables (NEVER hardcode secrets!)
 SECRET_KEY = os.getenv("JWT_SECRET", "CHANGE-THIS-SECRET-KEY-IN-PRODUCTION")
 ALGORITHM = "HS256"
@@ -34,10 +36,16 @@ def verify_token(authorization: Optional[str] = Header(None)) -> dict:
         if scheme.lower() != "bearer":
             raise HTTPException(status_code=401, detail="Invalid authentication scheme")
         
+        # Skip HMAC verification if this token was validated recently
+        payload = get_cached_payload(token)
+        if payload is not None:
+            return payload
+
         # Decode and verify token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        cache_payload(token, payload)
         return payload
-        
+
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except jwt.InvalidTokenError:
@@ -0,0 +1,46 @@
+"""
+Short-lived cache for decoded JWT payloads.
+
+The same bearer token is typically presented on every request for the
+token's entire lifetime, so re-running HMAC verification and claims
+parsing on each request is wasted CPU. Cache decoded payloads for a few
+seconds, keyed by a hash of the token (never the raw token itself).
+Invalid tokens are never cached.
+"""
+import hashlib
+import threading
+import time
+
+from cachetools import TTLCache
+
+# Small TTL keeps revocation/expiry windows tight while still absorbing
+# bursts of requests from the same client.
+CACHE_MAXSIZE = 10_000
+CACHE_TTL_SECONDS = 10
+
+_cache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL_SECONDS)
+_lock = threading.Lock()
+
+
+def _cache_key(token: str) -> bytes:
+    """Hash the raw token so it is never stored in memory verbatim."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def get_cached_payload(token: str):
+    """Return the cached decoded payload for a token, or None."""
+    key = _cache_key(token)
+    with _lock:
+        payload = _cache.get(key)
+
+    # Respect the token's own expiry even within the cache TTL window.
+    if payload is not None and payload.get("exp", 0) <= time.time():
+        return None
+    return payload
+
+
+def cache_payload(token: str, payload: dict) -> None:
+    """Cache a successfully decoded payload."""
+    key = _cache_key(token)
+    with _lock:
+        _cache[key] = payload
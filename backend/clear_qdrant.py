@@ -4,11 +4,12 @@ Clean up script to delete all documents from Qdrant collection.
 Use this before re-uploading documents to avoid duplicates.
 """
 from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, VectorParams
 
 def clear_collection():
     """Delete all points from the finance_documents collection."""
-    client = QdrantClient(host="localhost", port=6333)
-    
+    client = QdrantClient(host="localhost", port=6333, grpc_port=6334, prefer_grpc=True)
+
     try:
         # Get collection info
         info = client.get_collection("finance_documents")
@@ -25,8 +26,6 @@ def clear_collection():
             return
         
         # Delete all points by recreating the collection
-        from qdrant_client.models import Distance, VectorParams
-        
         print("\nDeleting collection...")
         client.delete_collection("finance_documents")
         
@@ -1,4 +1,10 @@
+import asyncio
+import hashlib
 import os
+from functools import lru_cache
+
+import diskcache
+import numpy as np
 from dotenv import load_dotenv
 try:
     from langchain_ollama import ChatOllama, OllamaEmbeddings
@@ -8,45 +14,173 @@ except ImportError:
 from langchain_core.messages import HumanMessage, SystemMessage
 from typing import List
 
+from prompts import build_qa_prompt
+
 load_dotenv()
 
 LLM_MODEL = os.getenv("LLM_MODEL", "llama3")
 LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:11434")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-minilm")
 
+# Embedding backend: "ollama" (default, HTTP round-trip per batch) or
+# "fastembed" (in-process ONNX model, no network hop; 384-dim
+# bge-small matches the collection's vector size).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "ollama")
+FASTEMBED_MODEL = os.getenv("FASTEMBED_MODEL", "BAAI/bge-small-en-v1.5")
+
+# Identifies the embedding space for persistent cache keys: vectors from
+# different backends/models must never collide.
+_EMBEDDER_ID = (
+    f"fastembed:{FASTEMBED_MODEL}" if EMBEDDING_BACKEND == "fastembed"
+    else f"ollama:{EMBEDDING_MODEL}"
+)
+
+
+class _FastembedEmbeddings:
+    """Local ONNX embedder with the same interface as OllamaEmbeddings."""
+
+    def __init__(self, model_name: str):
+        from fastembed import TextEmbedding
+        self._model = TextEmbedding(model_name)
+
+    def embed_query(self, text: str) -> List[float]:
+        return next(iter(self._model.embed([text]))).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [vector.tolist() for vector in self._model.embed(texts)]
+
+@lru_cache(maxsize=1)
 def get_llm():
-    """Get ChatOllama instance for text generation."""
+    """Get the shared ChatOllama instance for text generation."""
     return ChatOllama(model=LLM_MODEL, base_url=LLM_BASE_URL, temperature=0.0)
 
+@lru_cache(maxsize=1)
 def get_embeddings():
-    """Get OllamaEmbeddings instance for vector embeddings."""
+    """Get the shared embeddings instance for the configured backend."""
+    if EMBEDDING_BACKEND == "fastembed":
+        return _FastembedEmbeddings(FASTEMBED_MODEL)
     return OllamaEmbeddings(model=EMBEDDING_MODEL, base_url=LLM_BASE_URL)
 
+# Persistent embedding cache: vectors survive restarts and re-indexing
+# runs, stored as float16 bytes keyed by a hash of model name + text.
+# The in-process lru_cache below stays on top for hot entries.
+EMBED_CACHE_DIR = os.getenv(
+    "EMBED_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".emb_cache")
+)
+_disk_cache = diskcache.Cache(EMBED_CACHE_DIR)
+
+def _embed_cache_key(text: str) -> str:
+    return hashlib.sha256(f"{_EMBEDDER_ID}\x00{text}".encode()).hexdigest()
+
+def _disk_cache_get(key: str):
+    blob = _disk_cache.get(key)
+    if blob is None:
+        return None
+    return np.frombuffer(blob, dtype=np.float16).astype(np.float64).tolist()
+
+def _disk_cache_put(key: str, vector) -> None:
+    _disk_cache.set(key, np.asarray(vector, dtype=np.float16).tobytes())
+
+@lru_cache(maxsize=4096)
+def _embed_text_cached(text: str) -> tuple:
+    """Embed a single text, memoized (tuple result so entries are immutable)."""
+    key = _embed_cache_key(text)
+    cached = _disk_cache_get(key)
+    if cached is not None:
+        return tuple(cached)
+    vector = get_embeddings().embed_query(text)
+    _disk_cache_put(key, vector)
+    return tuple(vector)
+
 def embed_text(text: str) -> List[float]:
     """
     Generate embedding for a single text.
-    
+
+    Repeated queries (dashboards, suggested questions, retries) skip the
+    embedding model entirely via a bounded LRU keyed on the stripped text.
+
     Args:
         text: Text to embed
-        
+
     Returns:
         Embedding vector as list of floats
     """
-    embeddings = get_embeddings()
-    return embeddings.embed_query(text)
+    return list(_embed_text_cached(text.strip()))
+
+# Micro-batching for concurrent query embeddings: requests arriving within
+# the batching window are embedded together through embed_documents, so N
+# concurrent queries cost one batched model call instead of N single ones.
+EMBED_BATCH_WINDOW_SECONDS = float(os.getenv("EMBED_BATCH_WINDOW_SECONDS", "0.005"))
+
+_embed_queue = None
+_embed_batcher_task = None
+
+async def _embed_batcher():
+    """Collect queued texts over a short window and embed them as a batch."""
+    while True:
+        batch = [await _embed_queue.get()]
+        await asyncio.sleep(EMBED_BATCH_WINDOW_SECONDS)
+        while not _embed_queue.empty():
+            batch.append(_embed_queue.get_nowait())
+        texts = [text for text, _ in batch]
+        try:
+            if len(texts) == 1:
+                # Single request in the window: go through the per-text
+                # LRU so repeated queries skip the model entirely.
+                vectors = [await asyncio.to_thread(embed_text, texts[0])]
+            else:
+                vectors = await asyncio.to_thread(embed_documents, texts)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+async def embed_query_async(text: str) -> List[float]:
+    """
+    Generate an embedding for a query without blocking the event loop.
+
+    Concurrent callers are transparently batched; see _embed_batcher.
+
+    Args:
+        text: Query text to embed
+
+    Returns:
+        Embedding vector as list of floats
+    """
+    global _embed_queue, _embed_batcher_task
+    if _embed_batcher_task is None or _embed_batcher_task.done():
+        _embed_queue = asyncio.Queue()
+        _embed_batcher_task = asyncio.get_running_loop().create_task(_embed_batcher())
+    future = asyncio.get_running_loop().create_future()
+    _embed_queue.put_nowait((text, future))
+    return await future
 
 def embed_documents(texts: List[str]) -> List[List[float]]:
     """
     Generate embeddings for multiple texts.
-    
+
+    Texts already in the persistent cache are served from disk; only the
+    misses go to the embedding model, still as a single batched call.
+
     Args:
         texts: List of texts to embed
-        
+
     Returns:
         List of embedding vectors
     """
-    embeddings = get_embeddings()
-    return embeddings.embed_documents(texts)
+    keys = [_embed_cache_key(text) for text in texts]
+    results = [_disk_cache_get(key) for key in keys]
+    miss_indices = [i for i, vector in enumerate(results) if vector is None]
+    if miss_indices:
+        vectors = get_embeddings().embed_documents([texts[i] for i in miss_indices])
+        for i, vector in zip(miss_indices, vectors):
+            _disk_cache_put(keys[i], vector)
+            results[i] = vector
+    return results
 
 def generate_answer(query: str, context_documents: List[dict], num_unique_files: int = None) -> str:
     """
@@ -60,8 +194,6 @@ def generate_answer(query: str, context_documents: List[dict], num_unique_files:
     Returns:
         Generated answer
     """
-    from prompts import build_qa_prompt
-    
     llm = get_llm()
     
     # Use the prompt builder from prompts.py
@@ -1,47 +1,56 @@
 """
 LLM instruction templates and prompt engineering.
 """
+from functools import lru_cache
 from typing import List, Dict
 
+# Static QA prompt sections, frozen at module scope so build_qa_prompt
+# only joins precomputed pieces on the per-query hot path.
+_QA_PREFIX = """You are a helpful financial assistant. Answer the user's question comprehensively and in detail using the information in the context documents below.
+"""
+
+_QA_SUFFIX = """
+
+IMPORTANT Instructions:
+- Provide a thorough, detailed answer with specific information from the documents
+- Include relevant details, examples, and complete explanations
+- When referring to sources, understand that multiple excerpts may be from the same document file
+- Synthesize information naturally into a cohesive, informative response
+- Use complete sentences with proper context and explanations
+- Give comprehensive answers - don't be brief unless the question requires it
+
+Answer:"""
+
 
 def build_qa_prompt(query: str, context_documents: List[Dict], num_unique_files: int = None) -> str:
     """
     Build a question-answering prompt with context.
-    
+
     Args:
         query: User's question
         context_documents: Relevant documents for context (these are text chunks)
         num_unique_files: Number of unique source documents the chunks come from
-        
+
     Returns:
         Formatted prompt for LLM
     """
     context = format_context(context_documents)
-    
+
     # Add note about chunks vs documents
     chunk_note = ""
     if num_unique_files:
         num_chunks = len(context_documents)
         chunk_note = f"\n\nNOTE: You are seeing {num_chunks} text excerpt(s) from {num_unique_files} source document(s). Multiple excerpts may come from the same document file.\n"
-    
-    prompt = f"""You are a helpful financial assistant. Answer the user's question comprehensively and in detail using the information in the context documents below.
-{chunk_note}
-Context Documents:
-{context}
-
-User Question: {query}
-
-IMPORTANT Instructions:
-- Provide a thorough, detailed answer with specific information from the documents
-- Include relevant details, examples, and complete explanations
-- When referring to sources, understand that multiple excerpts may be from the same document file
-- Synthesize information naturally into a cohesive, informative response
-- Use complete sentences with proper context and explanations
-- Give comprehensive answers - don't be brief unless the question requires it
 
-Answer:"""
-    
-    return prompt
+    return "".join([
+        _QA_PREFIX,
+        chunk_note,
+        "\nContext Documents:\n",
+        context,
+        "\n\nUser Question: ",
+        query,
+        _QA_SUFFIX
+    ])
 
 
 def build_summarization_prompt(document: str, max_length: int = 200) -> str:
@@ -131,15 +140,11 @@ def format_context(documents: List[Dict]) -> str:
     """
     if not documents:
         return "No context documents available."
-    
-    formatted_docs = []
-    for i, doc in enumerate(documents, 1):
-        title = doc.get("title", f"Document {i}")
-        content = doc.get("content", "")
-        
-        formatted_docs.append(f"[Document {i}: {title}]\n{content}\n")
-    
-    return "\n".join(formatted_docs)
+
+    return "\n".join(
+        f"[Document {i}: {doc.get('title', f'Document {i}')}]\n{doc.get('content', '')}\n"
+        for i, doc in enumerate(documents, 1)
+    )
 
 
 # System prompts for different personas
@@ -154,6 +159,7 @@ SYSTEM_PROMPTS = {
 }
 
 
+@lru_cache(maxsize=8)
 def get_system_prompt(persona: str = "financial_advisor") -> str:
     """
     Get system prompt for a specific persona.
@@ -1,19 +1,41 @@
 """
 ACL-filtered document retrieval from vector database.
 """
+from functools import lru_cache
 from typing import List, Optional, Dict
+import logging
 import os
 import re
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
-from llm_client import embed_text
+import threading
+import time
 
-# Initialize Qdrant client (configure connection in production)
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    Filter,
+    FieldCondition,
+    MatchValue,
+    SearchParams,
+    QuantizationSearchParams
+)
+from llm_client import embed_query_async
+
+# Initialize Qdrant client (configure connection in production).
+# Async so searches and scrolls don't block the event loop; gRPC avoids
+# per-search JSON encode/decode on the query hot path.
 QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
 QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
-client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+client = AsyncQdrantClient(
+    host=QDRANT_HOST,
+    port=QDRANT_PORT,
+    grpc_port=QDRANT_GRPC_PORT,
+    prefer_grpc=True
+)
 COLLECTION_NAME = "finance_documents"
 
+logger = logging.getLogger(__name__)
+
 # Retrieval tuning knobs for larger corpora
 HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "8"))
 HYBRID_LEXICAL_POOL_LIMIT = int(os.getenv("HYBRID_LEXICAL_POOL_LIMIT", "1500"))
@@ -21,6 +43,7 @@ HYBRID_RRF_K = float(os.getenv("HYBRID_RRF_K", "60"))
 RERANK_DENSE_WEIGHT = float(os.getenv("RERANK_DENSE_WEIGHT", "0.60"))
 RERANK_LEXICAL_WEIGHT = float(os.getenv("RERANK_LEXICAL_WEIGHT", "0.40"))
 RERANK_FUSION_WEIGHT = float(os.getenv("RERANK_FUSION_WEIGHT", "0.35"))
+DENSE_GROUP_SIZE = int(os.getenv("DENSE_GROUP_SIZE", "3"))
 
 
 def _tokenize(text: str) -> List[str]:
@@ -53,7 +76,112 @@ def _normalize_scores(scores: Dict[str, float]) -> Dict[str, float]:
     return {k: (v - min_score) / (max_score - min_score) for k, v in scores.items()}
 
 
-def retrieve_documents(
+@lru_cache(maxsize=1024)
+def _build_filter(user_id: Optional[str], filter_items: Optional[frozenset]) -> Optional[Filter]:
+    """
+    Build the Qdrant filter for a (user_id, extra filters) pair, cached.
+
+    Filter construction walks a Pydantic model tree on every call; the
+    distinct filter shapes in practice are few (one per user plus a few
+    metadata combinations), so reuse them instead. Cached filters must be
+    treated as immutable by callers.
+    """
+    conditions = []
+    if user_id:
+        conditions.append(FieldCondition(key="acl", match=MatchValue(value=user_id)))
+    if filter_items:
+        conditions.extend(
+            FieldCondition(key=key, match=MatchValue(value=value))
+            for key, value in filter_items
+        )
+    return Filter(must=conditions) if conditions else None
+
+
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "300"))
+QUERY_CACHE_SIM_THRESHOLD = float(os.getenv("QUERY_CACHE_SIM_THRESHOLD", "0.97"))
+
+
+class QueryCache:
+    """
+    Semantic cache for retrieval results.
+
+    Stores normalized query vectors in a numpy matrix; a new query whose
+    cosine similarity to a cached query exceeds the threshold (with the
+    same ACL/filter/limit key) reuses the cached document list, skipping
+    Qdrant and the fusion/diversification passes entirely. Entries expire
+    after a TTL and the cache is cleared when documents change.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES,
+                 ttl=QUERY_CACHE_TTL_SECONDS,
+                 threshold=QUERY_CACHE_SIM_THRESHOLD):
+        self._lock = threading.RLock()
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._threshold = threshold
+        self._keys = []        # (user_id, filter_items, limit) per entry
+        self._expirations = []
+        self._results = []
+        self._matrix = None    # rows are unit query vectors
+
+    def get(self, query_vector, key) -> Optional[List[Dict]]:
+        with self._lock:
+            self._prune(time.monotonic())
+            if self._matrix is None or not len(self._results):
+                return None
+            unit = np.asarray(query_vector, dtype=np.float32)
+            norm = np.linalg.norm(unit)
+            if norm == 0:
+                return None
+            similarities = self._matrix @ (unit / norm)
+            for idx in np.argsort(similarities)[::-1]:
+                if similarities[idx] < self._threshold:
+                    break
+                if self._keys[idx] == key:
+                    return self._results[idx]
+            return None
+
+    def put(self, query_vector, key, documents: List[Dict]) -> None:
+        unit = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(unit)
+        if norm == 0:
+            return
+        unit = unit / norm
+        with self._lock:
+            if len(self._results) >= self._max_entries:
+                self._drop(0)
+            self._keys.append(key)
+            self._expirations.append(time.monotonic() + self._ttl)
+            self._results.append(documents)
+            row = unit.reshape(1, -1)
+            self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+            self._expirations.clear()
+            self._results.clear()
+            self._matrix = None
+
+    def _prune(self, now: float) -> None:
+        while self._expirations and self._expirations[0] <= now:
+            self._drop(0)
+
+    def _drop(self, idx: int) -> None:
+        del self._keys[idx], self._expirations[idx], self._results[idx]
+        self._matrix = np.delete(self._matrix, idx, axis=0) if len(self._results) else None
+
+
+_query_cache = QueryCache()
+
+
+def clear_query_cache() -> None:
+    """Invalidate cached retrieval results after documents change."""
+    _query_cache.clear()
+
+
+async def retrieve_documents(
     query: str,
     user_id: Optional[str] = None,
     filters: Optional[Dict] = None,
@@ -72,50 +200,64 @@ def retrieve_documents(
     Returns:
         List of relevant documents with metadata
     """
-    print(f"DEBUG retriever: Searching with user_id={user_id}")
-    
-    # Build ACL filter only if user_id is provided
-    if user_id:
-        acl_filter = Filter(
-            must=[
-                FieldCondition(
-                    key="acl",
-                    match=MatchValue(value=user_id)
-                )
-            ]
-        )
-    else:
-        # No ACL filter for admins
-        acl_filter = None
-    
-    # Add additional filters if provided
-    if filters:
-        if not acl_filter:
-            acl_filter = Filter(must=[])
-        for key, value in filters.items():
-            acl_filter.must.append(
-                FieldCondition(key=key, match=MatchValue(value=value))
-            )
+    logger.debug("Searching with user_id=%s", user_id)
+
+    acl_filter = _build_filter(
+        user_id,
+        frozenset(filters.items()) if filters else None
+    )
     try:
-        # Generate query embedding for dense retrieval
-        query_vector = embed_text(query)
+        # Generate query embedding for dense retrieval; concurrent
+        # queries are micro-batched into a single model call.
+        query_vector = await embed_query_async(query)
+
+        # Semantically equivalent recent queries reuse their results
+        cache_key = (
+            user_id,
+            frozenset(filters.items()) if filters else None,
+            limit
+        )
+        cached = _query_cache.get(query_vector, cache_key)
+        if cached is not None:
+            return cached
 
         candidate_limit = limit * HYBRID_CANDIDATE_MULTIPLIER
 
-        # Dense retrieval from Qdrant vector similarity
-        dense_results = client.query_points(
+        # Dense retrieval from Qdrant vector similarity, grouped by
+        # source file server-side: each file contributes at most
+        # DENSE_GROUP_SIZE chunks, so the candidate set is diverse
+        # without over-fetching near-duplicate chunks from one document.
+        # Vectors are returned so downstream guardrails can reuse the
+        # chunk embeddings without re-embedding.
+        grouped = await client.query_points_groups(
             collection_name=COLLECTION_NAME,
             query=query_vector,
             query_filter=acl_filter,
-            limit=candidate_limit
-        ).points
+            group_by="source_file",
+            group_size=DENSE_GROUP_SIZE,
+            limit=max(candidate_limit // DENSE_GROUP_SIZE, limit),
+            with_vectors=True,
+            # Only the payload keys the pipeline reads; skips
+            # deserializing anything else stored on the point
+            with_payload=["content", "source_file", "page_number", "chunk_index"],
+            # Search over the int8-quantized vectors, then rescore the
+            # oversampled top candidates with originals to keep recall
+            search_params=SearchParams(
+                quantization=QuantizationSearchParams(
+                    rescore=True,
+                    oversampling=2.0
+                )
+            )
+        )
+        dense_results = [hit for group in grouped.groups for hit in group.hits]
+        dense_results.sort(key=lambda hit: float(hit.score), reverse=True)
 
         # Lexical retrieval over a bounded candidate pool
-        lexical_pool, _ = client.scroll(
+        lexical_pool, _ = await client.scroll(
             collection_name=COLLECTION_NAME,
             scroll_filter=acl_filter,
             limit=max(candidate_limit * 5, HYBRID_LEXICAL_POOL_LIMIT),
-            with_payload=True,
+            with_payload=["content", "source_file", "page_number", "chunk_index"],
             with_vectors=False
         )
 
@@ -170,38 +312,24 @@ def retrieve_documents(
         fused.sort(key=lambda x: x[1], reverse=True)
         reranked_points = [point for point, _ in fused[:candidate_limit]]
 
-        # Diversify results: prefer one chunk per unique document
-        documents = []
+        # Diversify results: prefer one chunk per unique document.
+        # Single pass splitting points into per-file picks and backups;
+        # result dicts are only materialized for the chosen `limit` points.
+        primary = []
+        backup = []
         seen_files = set()
-        remaining_results = []
-
-        # First pass: one chunk per unique file
         for result in reranked_points:
             source_file = result.payload.get("source_file", "")
-            if source_file and source_file not in seen_files:
+            if source_file and source_file not in seen_files and len(primary) < limit:
                 seen_files.add(source_file)
-                documents.append({
-                    "id": result.id,
-                    "content": result.payload.get("content", ""),
-                    "title": source_file,
-                    "metadata": {
-                        "page_number": result.payload.get("page_number"),
-                        "source_file": source_file,
-                        "chunk_index": result.payload.get("chunk_index")
-                    },
-                    "score": float(getattr(result, "score", 0.0))
-                })
+                primary.append(result)
             else:
-                remaining_results.append(result)
-            
-            if len(documents) >= limit:
-                break
-
-        # Second pass: fill remaining slots with best matches
-        for result in remaining_results:
-            if len(documents) >= limit:
-                break
-            documents.append({
+                backup.append(result)
+
+        chosen = primary + backup[:limit - len(primary)]
+
+        documents = [
+            {
                 "id": result.id,
                 "content": result.payload.get("content", ""),
                 "title": result.payload.get("source_file", ""),
@@ -210,17 +338,20 @@ def retrieve_documents(
                     "source_file": result.payload.get("source_file"),
                     "chunk_index": result.payload.get("chunk_index")
                 },
-                "score": float(getattr(result, "score", 0.0))
-            })
-        
-        print(
-            f"DEBUG retriever: Returning {len(documents)} documents from {len(seen_files)} "
-            f"unique files using hybrid retrieval + reranking"
+                "score": float(getattr(result, "score", 0.0)),
+                "vector": getattr(result, "vector", None)
+            }
+            for result in chosen
+        ]
+
+
+        logger.debug(
+            "Returning %d documents from %d unique files using hybrid retrieval + reranking",
+            len(documents), len(seen_files)
         )
+        _query_cache.put(query_vector, cache_key, documents)
         return documents
-        
-    except Exception as e:
-        print(f"Error retrieving documents: {e}")
-        import traceback
-        traceback.print_exc()
+
+    except Exception:
+        logger.exception("Error retrieving documents")
         return []
@@ -2,12 +2,18 @@
 Embed document chunks and insert into Qdrant vector database.
 """
 from typing import List, Dict, Optional
-from qdrant_client import QdrantClient
+import asyncio
+import numpy as np
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.models import (
+    Datatype,
     Distance,
     VectorParams,
     PointStruct,
-    CollectionStatus
+    CollectionStatus,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType
 )
 import uuid
 import sys
@@ -25,19 +31,38 @@ class QdrantUpserter:
         self,
         host: str = "localhost",
         port: int = 6333,
+        grpc_port: int = 6334,
         collection_name: str = "finance_documents",
         vector_size: int = 384  # sentence-transformers/all-MiniLM-L6-v2 dimension
     ):
         """
         Initialize Qdrant client and collection.
-        
+
         Args:
             host: Qdrant server host
-            port: Qdrant server port
+            port: Qdrant server port (REST, used for health checks)
+            grpc_port: Qdrant gRPC port (vector-heavy calls)
             collection_name: Name of the collection
             vector_size: Dimension of embedding vectors
         """
-        self.client = QdrantClient(host=host, port=port)
+        # gRPC sends vectors as protobuf floats instead of JSON numbers,
+        # roughly halving per-call CPU and wire bytes on upserts
+        self.client = QdrantClient(
+            host=host,
+            port=port,
+            grpc_port=grpc_port,
+            prefer_grpc=True,
+            timeout=30
+        )
+        # Async client for pipelined upserts: batch N's upsert RPC
+        # overlaps batch N+1's embedding work
+        self.aclient = AsyncQdrantClient(
+            host=host,
+            port=port,
+            grpc_port=grpc_port,
+            prefer_grpc=True,
+            timeout=30
+        )
         self.collection_name = collection_name
         self.vector_size = vector_size
         
@@ -56,76 +81,108 @@ class QdrantUpserter:
                     collection_name=self.collection_name,
                     vectors_config=VectorParams(
                         size=self.vector_size,
-                        distance=Distance.COSINE
+                        distance=Distance.COSINE,
+                        # Store originals in half precision; recall loss
+                        # is negligible at 384 dims and disk/RAM halve
+                        datatype=Datatype.FLOAT16
+                    ),
+                    # int8 scalar quantization: 4x smaller vectors in RAM
+                    # for the HNSW search pass; originals stay on disk
+                    # for rescoring.
+                    quantization_config=ScalarQuantization(
+                        scalar=ScalarQuantizationConfig(
+                            type=ScalarType.INT8,
+                            always_ram=True,
+                            quantile=0.99
+                        )
                     )
                 )
                 print(f"Collection '{self.collection_name}' created successfully")
             else:
                 print(f"Collection '{self.collection_name}' already exists")
-                
+
+            # Keyword payload indexes so ACL and metadata filters use a
+            # bitmap intersection instead of scanning payloads (idempotent)
+            for field_name in ("acl", "source_file", "document_id", "document_type"):
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema="keyword"
+                )
+
         except Exception as e:
             print(f"Error initializing collection: {e}")
             raise
     
-    def upsert_documents(
+    async def upsert_documents(
         self,
         documents: List[Dict],
         batch_size: int = 100
     ) -> int:
         """
         Embed and upsert documents into Qdrant.
-        
+
+        Batches run concurrently (bounded to 4 in flight): while one
+        batch's upsert RPC is on the wire, the next batch embeds in a
+        worker thread, so wall time approaches the slower of the two
+        stages instead of their sum.
+
         Args:
             documents: List of document chunks with content and metadata
             batch_size: Number of documents to process in each batch
-            
+
         Returns:
             Number of documents successfully inserted
         """
-        total_inserted = 0
-        
-        for i in range(0, len(documents), batch_size):
-            batch = documents[i:i + batch_size]
-            print(f"Processing batch {i // batch_size + 1} ({len(batch)} documents)")
-            
-            try:
-                # Generate embeddings for batch
-                embeddings = self._embed_batch(batch)
-                
-                # Prepare points for insertion
-                points = []
-                for doc, embedding in zip(batch, embeddings):
-                    point = PointStruct(
-                        id=str(uuid.uuid4()),
-                        vector=embedding,
-                        payload={
-                            "content": doc.get("content", ""),
-                            "title": doc.get("title", ""),
-                            "document_id": doc.get("document_id", ""),
-                            "chunk_index": doc.get("chunk_index", 0),
-                            "acl": doc.get("acl", []),
-                            "metadata": doc.get("metadata", {})
-                        }
+        semaphore = asyncio.Semaphore(4)
+
+        async def upsert_batch(batch_num: int, batch: List[Dict]) -> int:
+            async with semaphore:
+                print(f"Processing batch {batch_num} ({len(batch)} documents)")
+                try:
+                    # Generate embeddings for batch (off the event loop)
+                    embeddings = await asyncio.to_thread(self._embed_batch, batch)
+
+                    # Prepare points for insertion
+                    points = []
+                    for doc, embedding in zip(batch, embeddings):
+                        point = PointStruct(
+                            id=str(uuid.uuid4()),
+                            vector=embedding,
+                            payload={
+                                "content": doc.get("content", ""),
+                                "title": doc.get("title", ""),
+                                "document_id": doc.get("document_id", ""),
+                                "chunk_index": doc.get("chunk_index", 0),
+                                "acl": doc.get("acl", []),
+                                "metadata": doc.get("metadata", {})
+                            }
+                        )
+                        points.append(point)
+
+                    # Upsert to Qdrant
+                    await self.aclient.upsert(
+                        collection_name=self.collection_name,
+                        points=points
                     )
-                    points.append(point)
-                
-                # Upsert to Qdrant
-                self.client.upsert(
-                    collection_name=self.collection_name,
-                    points=points
-                )
-                
-                total_inserted += len(points)
-                print(f"Successfully inserted {len(points)} documents")
-                
-            except Exception as e:
-                print(f"Error processing batch: {e}")
-                continue
-        
+
+                    print(f"Successfully inserted {len(points)} documents")
+                    return len(points)
+
+                except Exception as e:
+                    print(f"Error processing batch {batch_num}: {e}")
+                    return 0
+
+        tasks = [
+            upsert_batch(i // batch_size + 1, documents[i:i + batch_size])
+            for i in range(0, len(documents), batch_size)
+        ]
+        total_inserted = sum(await asyncio.gather(*tasks))
+
         print(f"Total documents inserted: {total_inserted}")
         return total_inserted
     
-    def _embed_batch(self, documents: List[Dict]) -> List[List[float]]:
+    def _embed_batch(self, documents: List[Dict]) -> np.ndarray:
         """
         Generate embeddings for a batch of documents.
         
@@ -144,7 +201,7 @@ class QdrantUpserter:
         
         return embeddings
     
-    def _generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def _generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings using Ollama embedding model.
         
@@ -155,7 +212,9 @@ class QdrantUpserter:
             List of embedding vectors
         """
         print(f"Generating embeddings for {len(texts)} texts...")
-        return embed_documents(texts)
+        # float32 ndarray instead of nested lists of boxed Python floats:
+        # a quarter of the memory while batches sit in flight
+        return np.asarray(embed_documents(texts), dtype=np.float32)
     
     def get_collection_info(self) -> Dict:
         """
@@ -207,7 +266,7 @@ def main():
             documents = json.load(f)
         
         # Upsert documents
-        count = upserter.upsert_documents(documents, batch_size=100)
+        count = asyncio.run(upserter.upsert_documents(documents, batch_size=100))
         print(f"Inserted {count} documents into Qdrant")
         
         # Show collection info